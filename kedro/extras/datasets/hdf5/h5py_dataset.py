@@ -2,15 +2,21 @@
 filesystem (e.g.: local, S3, GCS). It uses h5py.File to handle the hdf file.
 """
 
-import tempfile
-from copy import deepcopy
+import asyncio
+import mmap
+from collections import defaultdict
 from io import BytesIO
+from itertools import count
 from pathlib import PurePosixPath
 from threading import Lock
-from typing import Any, Dict
+from typing import IO, Any, Dict, Iterable, List, Tuple
+from uuid import uuid4
+from weakref import WeakValueDictionary
 
 import fsspec
 import h5py
+import numpy as np
+from fsspec.asyn import AsyncFileSystem, sync
 
 from kedro.io.core import (
     AbstractVersionedDataSet,
@@ -19,6 +25,118 @@ from kedro.io.core import (
     get_filepath_str,
     get_protocol_and_path,
 )
+from kedro.io.partitioned_dataset import S3_PROTOCOLS
+
+try:
+    from fsspec.asyn import _run_coros_in_chunks
+except ImportError:  # pragma: no cover
+    _run_coros_in_chunks = None  # fsspec<2021.6
+
+# HDF5 tells open files apart by name, so every in-memory file image needs its own
+_image_ids = count()
+_COPY_FLAGS = (
+    h5py.h5o.COPY_EXPAND_SOFT_LINK_FLAG
+    | h5py.h5o.COPY_EXPAND_EXT_LINK_FLAG
+    | h5py.h5o.COPY_EXPAND_REFERENCE_FLAG
+)
+_DEFAULT_REWRITE_ARGS = {"chunk_size": 1024 * 1024, "compression": "lzf"}
+# Arguments of ``h5py.Group.create_dataset`` derived from each source dataset
+_DERIVED_DATASET_ARGS = {"name", "shape", "dtype", "maxshape", "fillvalue", "chunks"}
+# Existence checks issued at once when fsspec cannot throttle them itself
+_EXISTS_BATCH_SIZE = 1280
+
+
+def _auto_chunks(
+    shape: Tuple[int, ...], dtype: np.dtype, target: int
+) -> Tuple[int, ...]:
+    """Computes a chunk shape for a dataset of the given shape and dtype, halving its
+    largest dimension until a chunk takes at most ``target`` bytes.
+    """
+    chunks = list(shape)
+    while np.prod(chunks) * dtype.itemsize > target and max(chunks) > 1:
+        largest = chunks.index(max(chunks))
+        chunks[largest] = -(-chunks[largest] // 2)
+    return tuple(chunks)
+
+
+def _same_layout(first: h5py.Dataset, second: h5py.Dataset) -> bool:
+    """Tells whether two datasets store their chunks in exactly the same way."""
+    # Compare the whole filter pipeline, as ``compression`` alone reports every
+    # plugin filter as "unknown" regardless of its id and options
+    # pylint: disable=protected-access
+    return (
+        first.dtype == second.dtype
+        and first.chunks == second.chunks
+        and first._filters == second._filters
+    )
+
+
+def _copy_rewritten(
+    source: h5py.Group, dest: h5py.Group, name: str, chunk_size: int, **dataset_args
+) -> None:
+    """Copies ``source[name]`` into ``dest``, rewriting numeric datasets with chunks
+    of roughly ``chunk_size`` bytes and the given ``h5py.Group.create_dataset``
+    arguments. Anything else is copied as is.
+    """
+    item = source[name]
+    if isinstance(item, h5py.Group):
+        group = dest.create_group(name)
+        group.attrs.update(item.attrs)
+        for child in item:
+            _copy_rewritten(item, group, child, chunk_size, **dataset_args)
+    elif (
+        isinstance(item, h5py.Dataset)
+        and item.dtype.kind in "biufc"
+        and item.ndim > 0
+        and item.size > 0
+    ):
+        dataset = dest.create_dataset(
+            name,
+            shape=item.shape,
+            dtype=item.dtype,
+            maxshape=item.maxshape,
+            fillvalue=item.fillvalue,
+            chunks=_auto_chunks(item.shape, item.dtype, chunk_size),
+            **dataset_args,
+        )
+        if _same_layout(item, dataset):
+            # Stored chunks are already encoded as requested, so copy their raw
+            # bytes rather than decoding and encoding them again
+            for index in range(item.id.get_num_chunks()):
+                offset = item.id.get_chunk_info(index).chunk_offset
+                filter_mask, chunk = item.id.read_direct_chunk(offset)
+                dataset.id.write_direct_chunk(offset, chunk, filter_mask)
+        else:
+            for chunk in dataset.iter_chunks():
+                dataset[chunk] = item[chunk]
+        dataset.attrs.update(item.attrs)
+    else:
+        source.copy(
+            name,
+            dest,
+            name=name,
+            expand_soft=True,
+            expand_external=True,
+            expand_refs=True,
+        )
+
+
+async def _exists_all(fs: AsyncFileSystem, paths: List[str]) -> List[bool]:
+    """Checks whether each of the given paths exists, issuing the checks
+    concurrently in batches of at most ``fs.batch_size``.
+    """
+    # pylint: disable=protected-access
+    batch_size = getattr(fs, "batch_size", None)
+    if _run_coros_in_chunks is not None:
+        coros = [fs._exists(path) for path in paths]
+        return await _run_coros_in_chunks(coros, batch_size=batch_size, nofiles=True)
+
+    batch_size = batch_size or _EXISTS_BATCH_SIZE
+    results = []  # type: List[bool]
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start : start + batch_size]
+        results.extend(await asyncio.gather(*(fs._exists(path) for path in batch)))
+    return results
 
 
 class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
@@ -61,13 +179,20 @@ class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
 
     """
 
-    # _lock is a class attribute that will be shared across all the instances.
-    # It is used to make dataset safe for threads.
-    _lock = Lock()
+    # _locks is a class attribute that will be shared across all the instances.
+    # It holds one lock per file, used to make dataset safe for threads while still
+    # letting different files be loaded and saved concurrently. A lock is dropped
+    # as soon as no instance pointing to its file is alive anymore.
+    _locks = WeakValueDictionary()  # type: WeakValueDictionary[Tuple[str, str], Lock]
+    _locks_guard = Lock()
     DEFAULT_LOAD_ARGS = {}  # type: Dict[str, Any]
     DEFAULT_SAVE_ARGS = {}  # type: Dict[str, Any]
 
-    # pylint: disable=protected-access
+    @classmethod
+    def _get_lock(cls, key: Tuple[str, str]) -> Lock:
+        with cls._locks_guard:
+            return cls._locks.setdefault(key, Lock())
+
     @staticmethod
     def __h5py_from_binary(binary, load_args):
         file_access_property_list = h5py.h5p.create(h5py.h5p.FILE_ACCESS)
@@ -77,7 +202,7 @@ class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
         file_id_args = {
             "fapl": file_access_property_list,
             "flags": h5py.h5f.ACC_RDONLY,
-            "name": next(tempfile._get_candidate_names()).encode(),
+            "name": f"kedro_h5py_image_{next(_image_ids)}".encode(),
         }
         h5_file_args = {"backing_store": False, "driver": "core", "mode": "r"}
 
@@ -85,19 +210,25 @@ class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
         return h5py.File(file_id, **h5_file_args, **load_args)
 
     @staticmethod
-    def __h5py_to_binary(h5f: h5py.File, save_args):
-        bio = BytesIO()
-        with h5py.File(bio, "w", **save_args) as biof:
-            for _, value in h5f.items():
-                h5f.copy(
-                    value,
-                    biof,
-                    expand_soft=True,
-                    expand_external=True,
-                    expand_refs=True,
+    def __h5py_to_fileobj(
+        h5f: h5py.File, fileobj: IO[bytes], save_args, rewrite_args
+    ) -> None:
+        with h5py.File(fileobj, "w", **save_args) as biof:
+            if rewrite_args is not None:
+                for name in h5f:
+                    _copy_rewritten(h5f, biof, name, **rewrite_args)
+                return
+
+            # Copy root objects by name through the low-level API, sharing a single
+            # property list between them. ``h5py.Group.copy`` would open each object
+            # in Python and build a new property list for every call.
+            copy_property_list = h5py.h5p.create(h5py.h5p.OBJECT_COPY)
+            copy_property_list.set_copy_object(_COPY_FLAGS)
+            for name in h5f:
+                encoded_name = name.encode()
+                h5py.h5o.copy(
+                    h5f.id, encoded_name, biof.id, encoded_name, copy_property_list
                 )
-            biof.close()
-            return bio.getvalue()
 
     # pylint: disable=too-many-arguments
     def __init__(
@@ -125,6 +256,12 @@ class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
                 You can find all available arguments at:
                 https://docs.h5py.org/en/stable/high/file.html#h5py.File
                 All defaults are preserved.
+                Datasets are copied with their original layout, unless a nested
+                `rewrite` key is given. Numeric datasets are then rewritten with
+                chunks of about `chunk_size` bytes (defaults to 1 MiB), using the
+                remaining keys as ``h5py.Group.create_dataset`` arguments
+                (`compression` defaults to `lzf`). Here you can find all of them:
+                https://docs.h5py.org/en/stable/high/group.html#h5py.Group.create_dataset
             version: If specified, should be an instance of
                 ``kedro.io.core.Version``. If its ``load`` attribute is
                 None, the latest version will be loaded. If its ``save``
@@ -137,16 +274,25 @@ class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
                 `open_args_load` and `open_args_save`.
                 Here you can find all available arguments for `open`:
                 https://filesystem-spec.readthedocs.io/en/latest/api.html#fsspec.spec.AbstractFileSystem.open
-                All defaults are preserved, except `mode`, which is set `wb` when saving.
+                All defaults are preserved, except `mode`, which is set `wb` when saving,
+                and `cache_type` and `block_size`, which are set to `readahead` and
+                16 MiB respectively when loading.
+
+        Raises:
+            DataSetError: When the `rewrite` key of ``save_args`` is not a dictionary
+                or sets arguments taken from the datasets being rewritten.
         """
-        _fs_args = deepcopy(fs_args) or {}
-        _fs_open_args_load = _fs_args.pop("open_args_load", {})
-        _fs_open_args_save = _fs_args.pop("open_args_save", {})
-        _credentials = deepcopy(credentials) or {}
+        _fs_args = dict(fs_args or {})
+        _fs_open_args_load = dict(_fs_args.pop("open_args_load", {}))
+        _fs_open_args_save = dict(_fs_args.pop("open_args_save", {}))
+        _credentials = dict(credentials or {})
 
         protocol, path = get_protocol_and_path(filepath, version)
         if protocol == "file":
             _fs_args.setdefault("auto_mkdir", True)
+        elif protocol in S3_PROTOCOLS:
+            # Resolve each bucket's region once instead of on every request
+            _fs_args.setdefault("cache_regions", True)
 
         self._protocol = protocol
         self._fs = fsspec.filesystem(self._protocol, **_credentials, **_fs_args)
@@ -158,60 +304,184 @@ class H5pyDataSet(AbstractVersionedDataSet[h5py.File, h5py.File]):
             glob_function=self._fs.glob,
         )
 
+        self._lock_key = (protocol, str(self._filepath))
+        self._lock = self._get_lock(self._lock_key)
+        # The path is fixed unless versioning is enabled, so only format it once
+        self._filepath_str = get_filepath_str(self._filepath, protocol)
+
         # Handle default load and save arguments
-        self._load_args = deepcopy(self.DEFAULT_LOAD_ARGS)
+        self._load_args = dict(self.DEFAULT_LOAD_ARGS)
         if load_args is not None:
             self._load_args.update(load_args)
-        self._save_args = deepcopy(self.DEFAULT_SAVE_ARGS)
+        self._save_args = dict(self.DEFAULT_SAVE_ARGS)
         if save_args is not None:
             self._save_args.update(save_args)
-
+        _rewrite_args = self._save_args.pop("rewrite", None)
+        if _rewrite_args is None:
+            self._rewrite_args = None
+        elif not isinstance(_rewrite_args, dict):
+            raise DataSetError(
+                f"'rewrite' in 'save_args' must be a dictionary, got {_rewrite_args}."
+            )
+        elif _DERIVED_DATASET_ARGS.intersection(_rewrite_args):
+            raise DataSetError(
+                f"'rewrite' in 'save_args' cannot set any of "
+                f"{sorted(_DERIVED_DATASET_ARGS)}, as they are taken from each "
+                f"dataset being rewritten."
+            )
+        else:
+            self._rewrite_args = {**_DEFAULT_REWRITE_ARGS, **_rewrite_args}
+
+        # HDF5 files are read whole and sequentially, so prefetch large blocks
+        _fs_open_args_load.setdefault("cache_type", "readahead")
+        _fs_open_args_load.setdefault("block_size", 16 * 1024 * 1024)
         _fs_open_args_save.setdefault("mode", "wb")
         self._fs_open_args_load = _fs_open_args_load
         self._fs_open_args_save = _fs_open_args_save
 
+        # h5py needs a seekable file to write into, which in practice means an
+        # uncompressed local file; anything else is buffered in memory first.
+        # Likewise, only uncompressed local files can be memory-mapped on load.
+        self._save_to_fileobj = (
+            protocol == "file" and "compression" not in _fs_open_args_save
+        )
+        self._load_from_mmap = (
+            protocol == "file" and "compression" not in _fs_open_args_load
+        )
+
     def _describe(self) -> Dict[str, Any]:
         return dict(
             filepath=self._filepath,
             protocol=self._protocol,
             load_args=self._load_args,
             save_args=self._save_args,
+            rewrite_args=self._rewrite_args,
             version=self._version,
         )
 
+    def _get_load_path_str(self) -> str:
+        if not self._version:
+            return self._filepath_str
+        return get_filepath_str(self._get_load_path(), self._protocol)
+
+    def _get_save_path_str(self) -> str:
+        if not self._version:
+            return self._filepath_str
+        return get_filepath_str(self._get_save_path(), self._protocol)
+
     def _load(self) -> h5py.File:
-        load_path = get_filepath_str(self._get_load_path(), self._protocol)
+        load_path = self._get_load_path_str()
+
+        if self._load_from_mmap:
+            # HDF5 copies the file image anyway, so let it read from the page cache
+            # rather than from an intermediate ``bytes`` copy. The file is mapped
+            # under the lock so that it cannot be replaced while being read.
+            with self._lock, self._fs.open(
+                load_path, **self._fs_open_args_load
+            ) as fs_file, mmap.mmap(
+                fs_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as binary_data:
+                return H5pyDataSet.__h5py_from_binary(binary_data, self._load_args)
 
         with self._fs.open(load_path, **self._fs_open_args_load) as fs_file:
             binary_data = fs_file.read()
 
-        with H5pyDataSet._lock:
+        with self._lock:
             return H5pyDataSet.__h5py_from_binary(binary_data, self._load_args)
 
     def _save(self, data: h5py.File) -> None:
-        save_path = get_filepath_str(self._get_save_path(), self._protocol)
-
-        with H5pyDataSet._lock:
-            binary_data = H5pyDataSet.__h5py_to_binary(data, self._save_args)
+        save_path = self._get_save_path_str()
+
+        if self._save_to_fileobj:
+            # Write into a temporary file next to the target and only move it over
+            # the target once the copy succeeded. This keeps the previous file if
+            # the save fails, and lets ``data`` be open on the target itself.
+            target = PurePosixPath(save_path)
+            temp_path = str(target.with_name(f".{target.name}.{uuid4().hex}.tmp"))
+            with self._lock:
+                try:
+                    with self._fs.open(temp_path, **self._fs_open_args_save) as fs_file:
+                        H5pyDataSet.__h5py_to_fileobj(
+                            data, fs_file, self._save_args, self._rewrite_args
+                        )
+                    self._fs.mv(temp_path, save_path)
+                finally:
+                    if self._fs.exists(temp_path):
+                        self._fs.rm(temp_path)
+        else:
+            bio = BytesIO()
+            with self._lock:
+                H5pyDataSet.__h5py_to_fileobj(
+                    data, bio, self._save_args, self._rewrite_args
+                )
 
-        with self._fs.open(save_path, **self._fs_open_args_save) as fs_file:
-            fs_file.write(binary_data)
+                # ``getbuffer`` exposes the in-memory image without copying it into
+                # a new ``bytes`` object, which would double peak memory usage.
+                with bio.getbuffer() as binary_data, self._fs.open(
+                    save_path, **self._fs_open_args_save
+                ) as fs_file:
+                    fs_file.write(binary_data)
 
         self._invalidate_cache()
 
     def _exists(self) -> bool:
         try:
-            load_path = get_filepath_str(self._get_load_path(), self._protocol)
+            load_path = self._get_load_path_str()
         except DataSetError:
             return False
 
         return self._fs.exists(load_path)
 
+    @classmethod
+    def _bulk_exists(cls, data_sets: Iterable["H5pyDataSet"]) -> List[bool]:
+        """Checks whether each of the given data sets exists. Checks against the
+        same asynchronous filesystem (e.g. S3, GCS) are issued concurrently rather
+        than one request after another, so ``DataCatalog`` can dispatch batches of
+        existence checks here.
+
+        Args:
+            data_sets: Data sets to check.
+
+        Returns:
+            Whether each data set exists, in the order they were given.
+        """
+        # pylint: disable=protected-access
+        data_sets = list(data_sets)
+        results = [False] * len(data_sets)
+        paths_by_fs = defaultdict(list)  # type: Dict[fsspec.AbstractFileSystem, List]
+
+        for index, data_set in enumerate(data_sets):
+            try:
+                paths_by_fs[data_set._fs].append((index, data_set._get_load_path_str()))
+            except DataSetError:
+                continue
+
+        for fs, indexed_paths in paths_by_fs.items():
+            paths = [path for _, path in indexed_paths]
+            if isinstance(fs, AsyncFileSystem):
+                exists = sync(fs.loop, _exists_all, fs, paths)
+            else:
+                exists = [fs.exists(path) for path in paths]
+            for (index, _), path_exists in zip(indexed_paths, exists):
+                results[index] = path_exists
+
+        return results
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Locks cannot be pickled, e.g. when ``ParallelRunner`` sends the data set
+        # to another process, so the shared lock is looked up again on unpickling
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = self._get_lock(self._lock_key)
+
     def _release(self) -> None:
         super()._release()
         self._invalidate_cache()
 
     def _invalidate_cache(self) -> None:
         """Invalidate underlying filesystem caches."""
-        filepath = get_filepath_str(self._filepath, self._protocol)
-        self._fs.invalidate_cache(filepath)
+        self._fs.invalidate_cache(self._filepath_str)
@@ -2,14 +2,13 @@
 file using an underlying filesystem (e.g.: local, S3, GCS). It loads the JSON into a
 plotly figure.
 """
-from copy import deepcopy
 from typing import Any, Dict
 
 import pandas as pd
 import plotly.express as px
 from plotly import graph_objects as go
 
-from kedro.io.core import Version
+from kedro.io.core import DataSetError, Version
 
 from .json_dataset import JSONDataSet
 
@@ -70,7 +69,9 @@ class PlotlyDataSet(JSONDataSet):
             save_args: Plotly options for saving JSON files.
                 Here you can find all available arguments:
                 https://plotly.com/python-api-reference/generated/plotly.io.write_json.html
-                All defaults are preserved.
+                All defaults are preserved. With plotly>=5, figures are encoded
+                with `orjson` if it is installed, which is much faster on large
+                figures, and the `engine` argument selects the encoder explicitly.
             version: If specified, should be an instance of
                 ``kedro.io.core.Version``. If its ``load`` attribute is
                 None, the latest version will be loaded. If its ``save``
@@ -84,17 +85,21 @@ class PlotlyDataSet(JSONDataSet):
                 Here you can find all available arguments for `open`:
                 https://filesystem-spec.readthedocs.io/en/latest/api.html#fsspec.spec.AbstractFileSystem.open
                 All defaults are preserved, except `mode`, which is set to `w` when saving.
+
+        Raises:
+            DataSetError: When the `type` in ``plotly_args`` is not a plotly express
+                function.
         """
         super().__init__(filepath, load_args, save_args, version, credentials, fs_args)
         self._plotly_args = plotly_args
 
-        _fs_args = deepcopy(fs_args) or {}
-        _fs_open_args_load = _fs_args.pop("open_args_load", {})
-        _fs_open_args_save = _fs_args.pop("open_args_save", {})
-        _fs_open_args_save.setdefault("mode", "w")
-
-        self._fs_open_args_load = _fs_open_args_load
-        self._fs_open_args_save = _fs_open_args_save
+        try:
+            self._plot_function = getattr(px, plotly_args["type"])
+        except (AttributeError, KeyError, TypeError) as exc:
+            raise DataSetError(
+                f"'plotly_args' must have a 'type' naming a plotly express "
+                f"function, got {plotly_args}."
+            ) from exc
 
     def _describe(self) -> Dict[str, Any]:
         return {**super()._describe(), "plotly_args": self._plotly_args}
@@ -104,9 +109,11 @@ class PlotlyDataSet(JSONDataSet):
         super()._save(fig)
 
     def _plot_dataframe(self, data: pd.DataFrame) -> go.Figure:
-        plot_type = self._plotly_args.get("type")
-        fig_params = self._plotly_args.get("fig", {})
-        fig = getattr(px, plot_type)(data, **fig_params)  # type: ignore
-        fig.update_layout(template=self._plotly_args.get("theme", "plotly"))
-        fig.update_layout(self._plotly_args.get("layout", {}))
+        fig = self._plot_function(data, **self._plotly_args.get("fig", {}))
+        fig.update_layout(
+            {
+                "template": self._plotly_args.get("theme", "plotly"),
+                **self._plotly_args.get("layout", {}),
+            }
+        )
         return fig
@@ -1,15 +1,21 @@
+import asyncio
+import mmap
+import pickle
 from pathlib import Path, PurePosixPath
+from threading import Thread
 from typing import Union
 
 import h5py
 import numpy as np
 import pytest
+from fsspec.asyn import AsyncFileSystem
 from fsspec.implementations.http import HTTPFileSystem
 from fsspec.implementations.local import LocalFileSystem
 from gcsfs import GCSFileSystem
 from s3fs.core import S3FileSystem
 
-from kedro.extras.datasets.hdf5.h5py_dataset import H5pyDataSet
+from kedro.extras.datasets.hdf5 import h5py_dataset
+from kedro.extras.datasets.hdf5.h5py_dataset import H5pyDataSet, _auto_chunks
 from kedro.io import DataSetError
 from kedro.io.core import PROTOCOL_DELIMITER, Version
 
@@ -20,8 +26,7 @@ def filepath_hdf(tmp_path):
 
 
 @pytest.fixture
-def hdf_data_set(filepath_hdf, load_args, save_args, mocker, fs_args):
-    H5pyDataSet._lock = mocker.MagicMock()
+def hdf_data_set(filepath_hdf, load_args, save_args, fs_args):
     return H5pyDataSet(
         filepath=filepath_hdf,
         load_args=load_args,
@@ -79,9 +84,198 @@ class TestH5pyDataSet:
         hdf_data_set.save(dummy_h5f)
         reloaded = hdf_data_set.load()
         assert_h5py_equal(dummy_h5f, reloaded)
-        assert hdf_data_set._fs_open_args_load == {}
+        assert hdf_data_set._fs_open_args_load == {
+            "cache_type": "readahead",
+            "block_size": 16 * 1024 * 1024,
+        }
         assert hdf_data_set._fs_open_args_save == {"mode": "wb"}
 
+    def test_save_local_file_directly(self, hdf_data_set, dummy_h5f, mocker):
+        """Test that local files are written by h5py without an in-memory copy."""
+        bytes_io = mocker.patch("kedro.extras.datasets.hdf5.h5py_dataset.BytesIO")
+        hdf_data_set.save(dummy_h5f)
+        bytes_io.assert_not_called()
+        assert assert_h5py_equal(dummy_h5f, hdf_data_set.load())
+
+    def test_failed_save_keeps_existing_file(
+        self, hdf_data_set, dummy_h5f, filepath_hdf, tmp_path
+    ):
+        """Test that a save failing halfway leaves the previous file untouched."""
+        hdf_data_set.save(dummy_h5f)
+        dummy_h5f["dangling"] = h5py.ExternalLink("missing.h5", "/x")
+
+        with pytest.raises(DataSetError):
+            hdf_data_set.save(dummy_h5f)
+
+        del dummy_h5f["dangling"]
+        assert assert_h5py_equal(dummy_h5f, hdf_data_set.load())
+        # No temporary file is left behind either
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "dummy.h5",
+            Path(filepath_hdf).name,
+        ]
+
+    def test_save_file_open_on_target(self, hdf_data_set, dummy_h5f, filepath_hdf):
+        """Test saving an ``h5py.File`` which is open on the target path itself."""
+        hdf_data_set.save(dummy_h5f)
+        with h5py.File(filepath_hdf, "r") as target_h5f:
+            hdf_data_set.save(target_h5f)
+        assert assert_h5py_equal(dummy_h5f, hdf_data_set.load())
+
+    def test_save_and_load_non_local_file(self, dummy_h5f):
+        """Test saving and reloading through a filesystem h5py cannot write into."""
+        data_set = H5pyDataSet(filepath="memory://test.h5")
+        assert not data_set._save_to_fileobj
+        assert not data_set._load_from_mmap
+        data_set.save(dummy_h5f)
+        assert assert_h5py_equal(dummy_h5f, data_set.load())
+
+    def test_save_links_and_unicode_names(self, hdf_data_set, dummy_h5f):
+        """Test that root soft links are expanded and non-ASCII names kept."""
+        dummy_h5f["c"] = h5py.SoftLink("/b")
+        dummy_h5f.create_dataset("größe", data=np.array([3, 4]))
+        hdf_data_set.save(dummy_h5f)
+        reloaded = hdf_data_set.load()
+        assert set(reloaded) == {"foo", "b", "c", "größe"}
+        assert isinstance(reloaded.get("c", getlink=True), h5py.HardLink)
+        assert assert_h5py_equal(dummy_h5f, reloaded)
+
+    def test_load_twice(self, hdf_data_set, dummy_h5f):
+        """Test that each load gets its own in-memory file."""
+        hdf_data_set.save(dummy_h5f)
+        first, second = hdf_data_set.load(), hdf_data_set.load()
+        assert first.filename != second.filename
+        first.close()
+        assert assert_h5py_equal(dummy_h5f, second)
+
+    def test_load_local_file_mmap(self, hdf_data_set, dummy_h5f, mocker):
+        """Test that local files are memory-mapped instead of read into memory."""
+        hdf_data_set.save(dummy_h5f)
+        mmap_spy = mocker.spy(mmap, "mmap")
+        reloaded = hdf_data_set.load()
+        mmap_spy.assert_called_once()
+        assert assert_h5py_equal(dummy_h5f, reloaded)
+
+    @pytest.mark.parametrize(
+        "fs_args",
+        [
+            {
+                "open_args_load": {"compression": "gzip"},
+                "open_args_save": {"compression": "gzip"},
+            }
+        ],
+        indirect=True,
+    )
+    def test_save_and_load_compressed(self, hdf_data_set, dummy_h5f):
+        """Test saving and reloading compressed local files through memory."""
+        assert not hdf_data_set._save_to_fileobj
+        assert not hdf_data_set._load_from_mmap
+        hdf_data_set.save(dummy_h5f)
+        assert assert_h5py_equal(dummy_h5f, hdf_data_set.load())
+
+    @pytest.mark.parametrize(
+        "save_args", [{"rewrite": {"chunk_size": 1024}}], indirect=True
+    )
+    def test_save_rewrite(self, hdf_data_set, dummy_h5f):
+        """Test rewriting numeric datasets with new chunks and compression."""
+        dummy_h5f.create_dataset("c", data=np.arange(1000))
+        dummy_h5f["c"].attrs["unit"] = "m"
+        dummy_h5f.create_dataset("d", data=["x", "y"])
+        assert "rewrite" not in hdf_data_set._save_args
+
+        hdf_data_set.save(dummy_h5f)
+        reloaded = hdf_data_set.load()
+        assert assert_h5py_equal(dummy_h5f, reloaded)
+        assert reloaded["c"].chunks == (125,)
+        assert reloaded["c"].compression == "lzf"
+        assert reloaded["c"].attrs["unit"] == "m"
+        assert reloaded["foo/a"].compression == "lzf"
+        assert reloaded["d"].compression is None
+
+    @pytest.mark.parametrize(
+        "save_args", [{"rewrite": {"chunk_size": 1024}}], indirect=True
+    )
+    def test_rewrite_in_str_repr(self, hdf_data_set):
+        """Test that the rewrite options are shown, even though they are not passed
+        to ``h5py.File``."""
+        assert hdf_data_set._describe()["rewrite_args"] == {
+            "chunk_size": 1024,
+            "compression": "lzf",
+        }
+        assert "rewrite_args={'chunk_size': 1024, 'compression': lzf}" in str(
+            hdf_data_set
+        )
+
+    @pytest.mark.parametrize(
+        "rewrite,pattern",
+        [
+            ("lzf", r"'rewrite' in 'save_args' must be a dictionary, got lzf\."),
+            ({"chunks": (10,)}, r"'rewrite' in 'save_args' cannot set any of"),
+            ({"fillvalue": 0}, r"'rewrite' in 'save_args' cannot set any of"),
+        ],
+    )
+    def test_invalid_rewrite(self, filepath_hdf, rewrite, pattern):
+        with pytest.raises(DataSetError, match=pattern):
+            H5pyDataSet(filepath=filepath_hdf, save_args={"rewrite": rewrite})
+
+    @pytest.mark.parametrize(
+        "save_args", [{"rewrite": {"chunk_size": 1024}}], indirect=True
+    )
+    def test_save_rewrite_same_layout(self, hdf_data_set, dummy_h5f, mocker):
+        """Test that chunks already stored as requested are copied as they are."""
+        dummy_h5f.create_dataset(
+            "c", data=np.arange(1000), chunks=(125,), compression="lzf"
+        )
+        dummy_h5f.create_dataset("d", data=np.arange(1000), chunks=(100,))
+        layouts = {}
+        same_layout = h5py_dataset._same_layout
+
+        def record_same_layout(first, second):
+            layouts[first.name] = same_layout(first, second)
+            return layouts[first.name]
+
+        mocker.patch.object(
+            h5py_dataset, "_same_layout", side_effect=record_same_layout
+        )
+
+        hdf_data_set.save(dummy_h5f)
+        reloaded = hdf_data_set.load()
+        assert assert_h5py_equal(dummy_h5f, reloaded)
+        assert layouts == {"/foo/a": False, "/b": False, "/c": True, "/d": False}
+        assert reloaded["c"].chunks == reloaded["d"].chunks == (125,)
+
+    def test_same_layout_plugin_filters(self, tmp_path):
+        """Test that datasets using different plugin filters never share a layout,
+        even though h5py reports the same compression for both."""
+        with h5py.File(tmp_path / "filters.h5", "w") as h5f:
+            first, second = (
+                h5f.create_dataset(
+                    name,
+                    shape=(100,),
+                    chunks=(10,),
+                    compression=filter_id,
+                    allow_unknown_filter=True,
+                )
+                for name, filter_id in (("first", 32001), ("second", 32004))
+            )
+            assert first.compression == second.compression
+            assert first.compression_opts == second.compression_opts
+            assert not h5py_dataset._same_layout(first, second)
+
+    @pytest.mark.parametrize(
+        "shape,dtype,expected",
+        [
+            ((10,), "i8", (10,)),
+            ((1000,), "i8", (125,)),
+            ((1000, 3), "f4", (63, 3)),
+            ((2, 1000, 1000), "u1", (2, 16, 32)),
+        ],
+    )
+    def test_auto_chunks(self, shape, dtype, expected):
+        chunks = _auto_chunks(shape, np.dtype(dtype), 1024)
+        assert chunks == expected
+        assert np.prod(chunks) * np.dtype(dtype).itemsize <= 1024
+
     def test_exists(self, hdf_data_set, dummy_h5f):
         """Test `exists` method invocation for both existing and
         nonexistent data set."""
@@ -111,9 +305,27 @@ class TestH5pyDataSet:
         indirect=True,
     )
     def test_open_extra_args(self, hdf_data_set, fs_args):
-        assert hdf_data_set._fs_open_args_load == fs_args["open_args_load"]
+        assert hdf_data_set._fs_open_args_load == {
+            **fs_args["open_args_load"],
+            "cache_type": "readahead",
+            "block_size": 16 * 1024 * 1024,
+        }
         assert hdf_data_set._fs_open_args_save == {"mode": "wb"}  # default unchanged
 
+    @pytest.mark.parametrize(
+        "fs_args",
+        [{"open_args_load": {"cache_type": "mmap", "block_size": 1024}}],
+        indirect=True,
+    )
+    def test_open_args_load_override_defaults(self, hdf_data_set, fs_args):
+        assert hdf_data_set._fs_open_args_load == fs_args["open_args_load"]
+
+    def test_fs_args_not_modified(self, filepath_hdf):
+        """Check that the arguments passed in are left untouched."""
+        fs_args = {"open_args_load": {"mode": "rb"}, "open_args_save": {}}
+        H5pyDataSet(filepath=filepath_hdf, fs_args=fs_args)
+        assert fs_args == {"open_args_load": {"mode": "rb"}, "open_args_save": {}}
+
     def test_load_missing_file(self, hdf_data_set):
         """Check the error when trying to load missing file."""
         pattern = r"Failed while loading data from data set H5pyDataSet\(.*\)"
@@ -139,6 +351,28 @@ class TestH5pyDataSet:
         assert str(data_set._filepath) == path
         assert isinstance(data_set._filepath, PurePosixPath)
 
+    @pytest.mark.parametrize(
+        "filepath,filepath_str",
+        [
+            ("/tmp/test.h5", "/tmp/test.h5"),
+            ("s3://bucket/file.h5", "bucket/file.h5"),
+            ("https://example.com/file.h5", "https://example.com/file.h5"),
+        ],
+    )
+    def test_filepath_str(self, filepath, filepath_str):
+        data_set = H5pyDataSet(filepath=filepath)
+        assert data_set._filepath_str == filepath_str
+        assert data_set._get_load_path_str() == filepath_str
+        assert data_set._get_save_path_str() == filepath_str
+
+    @pytest.mark.parametrize(
+        "fs_args,cache_regions",
+        [({}, True), ({"cache_regions": False}, False)],
+    )
+    def test_s3_cache_regions(self, fs_args, cache_regions):
+        data_set = H5pyDataSet(filepath="s3://bucket/file.h5", fs_args=fs_args)
+        assert data_set._fs.cache_regions is cache_regions
+
     def test_catalog_release(self, mocker):
         fs_mock = mocker.patch("fsspec.filesystem").return_value
         filepath = "test.h5"
@@ -148,7 +382,7 @@ class TestH5pyDataSet:
 
     def test_thread_lock_usage(self, hdf_data_set, dummy_h5f, mocker):
         """Test thread lock usage."""
-        mocked_lock = H5pyDataSet._lock
+        mocked_lock = hdf_data_set._lock = mocker.MagicMock()
         mocked_lock.assert_not_called()
 
         hdf_data_set.save(dummy_h5f)
@@ -160,6 +394,79 @@ class TestH5pyDataSet:
         hdf_data_set.load()
         mocked_lock.assert_has_calls(calls)
 
+    def test_concurrent_save_and_load(self, hdf_data_set, dummy_h5f):
+        """Test that loads never see a file which is being saved concurrently."""
+        dummy_h5f.create_dataset("c", data=np.arange(1_000_000))
+        hdf_data_set.save(dummy_h5f)
+        errors = []
+
+        def save():
+            for _ in range(20):
+                hdf_data_set.save(dummy_h5f)
+
+        def load():
+            for _ in range(20):
+                try:
+                    reloaded = hdf_data_set.load()
+                    assert assert_h5py_equal(dummy_h5f, reloaded)
+                except Exception as exc:  # pylint: disable=broad-except
+                    errors.append(exc)
+
+        threads = [Thread(target=save), Thread(target=load)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+
+    def test_thread_lock_per_file(self, hdf_data_set, filepath_hdf, tmp_path):
+        """Test that data sets only share a lock when they point to the same file."""
+        same_file = H5pyDataSet(filepath=filepath_hdf)
+        other_file = H5pyDataSet(filepath=(tmp_path / "other.h5").as_posix())
+        assert same_file._lock is hdf_data_set._lock
+        assert other_file._lock is not hdf_data_set._lock
+
+    def test_bulk_exists(
+        self, hdf_data_set, versioned_hdf_data_set, dummy_h5f, tmp_path
+    ):
+        """Test checking several data sets, including one without any version."""
+        hdf_data_set.save(dummy_h5f)
+        missing = H5pyDataSet(filepath=(tmp_path / "missing.h5").as_posix())
+        assert H5pyDataSet._bulk_exists(
+            [missing, hdf_data_set, versioned_hdf_data_set]
+        ) == [False, True, False]
+
+    @pytest.mark.parametrize("batch_size", [None, 2])
+    def test_bulk_exists_async_filesystem(self, mocker, batch_size):
+        """Test that checks against an asynchronous filesystem are gathered."""
+        checked = []
+
+        async def _exists(path):
+            checked.append(path)
+            return path != "b.h5"
+
+        fs_mock = mocker.MagicMock(spec=AsyncFileSystem)
+        fs_mock._exists = _exists
+        fs_mock.batch_size = batch_size
+        mocker.patch("fsspec.filesystem", return_value=fs_mock)
+        mocker.patch(
+            "kedro.extras.datasets.hdf5.h5py_dataset.sync",
+            side_effect=lambda loop, func, *args: asyncio.run(func(*args)),
+        )
+        data_sets = [H5pyDataSet(filepath=path) for path in ["a.h5", "b.h5", "c.h5"]]
+
+        assert H5pyDataSet._bulk_exists(data_sets) == [True, False, True]
+        assert sorted(checked) == ["a.h5", "b.h5", "c.h5"]
+        fs_mock.exists.assert_not_called()
+
+    def test_pickle(self, hdf_data_set, dummy_h5f):
+        """Test that data sets can be pickled and share their file lock again once
+        unpickled."""
+        unpickled = pickle.loads(pickle.dumps(hdf_data_set))
+        assert unpickled._lock is hdf_data_set._lock
+        unpickled.save(dummy_h5f)
+        assert assert_h5py_equal(dummy_h5f, hdf_data_set.load())
+
 
 class TestH5pyDataSetVersioned:
     def test_version_str_repr(self, load_version, save_version):
@@ -49,6 +49,12 @@ class TestJSONDataSet:
         json_data_set.save(dummy_plot)
         assert json_data_set.exists()
 
+    def test_fs_args_not_modified(self, filepath_json):
+        """Check that the arguments passed in are left untouched."""
+        fs_args = {"open_args_load": {"mode": "r"}, "open_args_save": {}}
+        JSONDataSet(filepath=filepath_json, fs_args=fs_args)
+        assert fs_args == {"open_args_load": {"mode": "r"}, "open_args_save": {}}
+
     def test_load_missing_file(self, json_data_set):
         """Check the error when trying to load missing file."""
         pattern = r"Failed while loading data from data set JSONDataSet\(.*\)"
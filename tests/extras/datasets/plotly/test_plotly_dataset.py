@@ -1,6 +1,7 @@
 from pathlib import PurePosixPath
 
 import pandas as pd
+import plotly.io as pio
 import pytest
 from adlfs import AzureBlobFileSystem
 from fsspec.implementations.http import HTTPFileSystem
@@ -54,6 +55,14 @@ class TestPlotlyDataSet:
         assert "Test" in str(reloaded["layout"]["title"])
         assert isinstance(reloaded["data"][0], Scatter)
 
+    def test_plot_dataframe_layout(self, plotly_data_set, dummy_dataframe):
+        """Test that the theme and the layout are both applied to the figure."""
+        plotly_data_set._plotly_args["theme"] = "plotly_dark"
+        fig = plotly_data_set._plot_dataframe(dummy_dataframe)
+        assert fig.layout.template == pio.templates["plotly_dark"]
+        assert fig.layout.title.text == "Test"
+        assert fig.layout.xaxis.title.text == "x"
+
     def test_exists(self, plotly_data_set, dummy_dataframe):
         """Test `exists` method invocation for both existing and
         nonexistent data set."""
@@ -61,6 +70,15 @@ class TestPlotlyDataSet:
         plotly_data_set.save(dummy_dataframe)
         assert plotly_data_set.exists()
 
+    def test_fs_args_not_modified(self, filepath_json, plotly_args):
+        """Check that the arguments passed in are left untouched."""
+        fs_args = {"open_args_load": {"mode": "r"}, "open_args_save": {}}
+        data_set = PlotlyDataSet(
+            filepath=filepath_json, fs_args=fs_args, plotly_args=plotly_args
+        )
+        assert fs_args == {"open_args_load": {"mode": "r"}, "open_args_save": {}}
+        assert data_set._fs_open_args_save == {"mode": "w"}
+
     def test_load_missing_file(self, plotly_data_set):
         """Check the error when trying to load missing file."""
         pattern = r"Failed while loading data from data set PlotlyDataSet\(.*\)"
@@ -100,9 +118,10 @@ class TestPlotlyDataSet:
         data_set.release()
         fs_mock.invalidate_cache.assert_called_once_with(filepath)
 
-    def test_fail_if_invalid_plotly_args_provided(self):
-        plotly_args = []
-        filepath = "test.json"
-        data_set = PlotlyDataSet(filepath=filepath, plotly_args=plotly_args)
-        with pytest.raises(DataSetError):
-            data_set.save(dummy_dataframe)
+    @pytest.mark.parametrize(
+        "plotly_args", [[], {}, {"type": None}, {"type": "not_a_plot"}]
+    )
+    def test_fail_if_invalid_plotly_args_provided(self, plotly_args):
+        pattern = r"'plotly_args' must have a 'type' naming a plotly express function"
+        with pytest.raises(DataSetError, match=pattern):
+            PlotlyDataSet(filepath="test.json", plotly_args=plotly_args)